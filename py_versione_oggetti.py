@@ -1,61 +1,137 @@
 #!/usr/bin/env python3
 """
 Versione Python FINALE con messaggio di completamento in modalità interattiva
+Le informazioni di versione sono lette solo tramite le API native (ctypes):
+pywin32 non è più una dipendenza
 """
 
 import argparse
 import os
 import sys
 import csv
-import datetime
+import contextlib
+import itertools
+import mmap
 import multiprocessing
+import threading
+import time
 import concurrent.futures
 from pathlib import Path
-from typing import List, Dict, Optional, Set, Tuple
+from typing import Iterable, Iterator, List, Dict, Optional, Set, Tuple
 import ctypes
-from ctypes import wintypes, byref, create_string_buffer, c_void_p, c_uint, POINTER, Structure
+from ctypes import wintypes, byref, create_string_buffer, c_void_p, c_uint, POINTER
 import struct
 import tkinter as tk
 from tkinter import filedialog, messagebox
 
-# Definizione delle strutture Windows per accedere alle informazioni di versione
-class VS_FIXEDFILEINFO(Structure):
-    _fields_ = [
-        ('dwSignature', wintypes.DWORD),
-        ('dwStrucVersion', wintypes.DWORD),
-        ('dwFileVersionMS', wintypes.DWORD),  
-        ('dwFileVersionLS', wintypes.DWORD),
-        ('dwProductVersionMS', wintypes.DWORD),
-        ('dwProductVersionLS', wintypes.DWORD),
-        ('dwFileFlagsMask', wintypes.DWORD),
-        ('dwFileFlags', wintypes.DWORD),
-        ('dwFileOS', wintypes.DWORD),
-        ('dwFileType', wintypes.DWORD),
-        ('dwFileSubtype', wintypes.DWORD),
-        ('dwFileDateMS', wintypes.DWORD),
-        ('dwFileDateLS', wintypes.DWORD),
-    ]
+# Tipo e identificativo della risorsa con le informazioni di versione
+RT_VERSION = 16
+VS_VERSION_INFO = 1
+
+# Dimensione di VS_FIXEDFILEINFO (13 DWORD): i campi vengono letti con struct
+VS_FIXEDFILEINFO_SIZE = 13 * 4
+
+# Flag per SetErrorMode
+SEM_FAILCRITICALERRORS = 0x0001
+SEM_NOGPFAULTERRORBOX = 0x0002
+SEM_NOOPENFILEERRORBOX = 0x8000
+
+# Parametri per CreateFileW
+GENERIC_READ = 0x80000000
+FILE_SHARE_READ = 0x00000001
+FILE_SHARE_WRITE = 0x00000002
+FILE_SHARE_DELETE = 0x00000004
+OPEN_EXISTING = 3
+FILE_ATTRIBUTE_NORMAL = 0x00000080
+FILE_FLAG_SEQUENTIAL_SCAN = 0x08000000
+INVALID_HANDLE_VALUE = c_void_p(-1).value
+
+# Puntatori alle API di Windows: vengono caricati da _worker_init() in ogni
+# processo worker, una sola volta per processo e non per ogni file
+GetFileVersionInfoSizeW = None
+GetFileVersionInfoW = None
+VerQueryValueW = None
+CreateFileW = None
+CloseHandle = None
+WINDOWS_API_AVAILABLE = False
+
+def _load_version_api():
+    """
+    Carica version.dll e definisce le funzioni API usate per leggere le informazioni di versione
+    """
+    global GetFileVersionInfoSizeW, GetFileVersionInfoW, VerQueryValueW, CreateFileW, CloseHandle
+    global WINDOWS_API_AVAILABLE
+
+    try:
+        version_dll = ctypes.windll.version
 
-# Caricamento delle DLL di Windows
-try:
-    version_dll = ctypes.windll.version
+        # Definizione delle funzioni API
+        GetFileVersionInfoSizeW = version_dll.GetFileVersionInfoSizeW
+        GetFileVersionInfoSizeW.argtypes = [wintypes.LPCWSTR, POINTER(wintypes.DWORD)]
+        GetFileVersionInfoSizeW.restype = wintypes.DWORD
 
-    # Definizione delle funzioni API
-    GetFileVersionInfoSizeW = version_dll.GetFileVersionInfoSizeW
-    GetFileVersionInfoSizeW.argtypes = [wintypes.LPCWSTR, POINTER(wintypes.DWORD)]
-    GetFileVersionInfoSizeW.restype = wintypes.DWORD
+        GetFileVersionInfoW = version_dll.GetFileVersionInfoW
+        GetFileVersionInfoW.argtypes = [wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD, c_void_p]
+        GetFileVersionInfoW.restype = wintypes.BOOL
 
-    GetFileVersionInfoW = version_dll.GetFileVersionInfoW
-    GetFileVersionInfoW.argtypes = [wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD, c_void_p]
-    GetFileVersionInfoW.restype = wintypes.BOOL
+        VerQueryValueW = version_dll.VerQueryValueW
+        VerQueryValueW.argtypes = [c_void_p, wintypes.LPCWSTR, POINTER(c_void_p), POINTER(c_uint)]
+        VerQueryValueW.restype = wintypes.BOOL
 
-    VerQueryValueW = version_dll.VerQueryValueW
-    VerQueryValueW.argtypes = [c_void_p, wintypes.LPCWSTR, POINTER(c_void_p), POINTER(c_uint)]
-    VerQueryValueW.restype = wintypes.BOOL
+        kernel32 = ctypes.windll.kernel32
 
-    WINDOWS_API_AVAILABLE = True
-except:
-    WINDOWS_API_AVAILABLE = False
+        CreateFileW = kernel32.CreateFileW
+        CreateFileW.argtypes = [wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD, c_void_p,
+                                wintypes.DWORD, wintypes.DWORD, wintypes.HANDLE]
+        CreateFileW.restype = wintypes.HANDLE
+
+        CloseHandle = kernel32.CloseHandle
+        CloseHandle.argtypes = [wintypes.HANDLE]
+        CloseHandle.restype = wintypes.BOOL
+
+        WINDOWS_API_AVAILABLE = True
+    except:
+        WINDOWS_API_AVAILABLE = False
+
+def _worker_init():
+    """
+    Inizializzatore dei processi worker del ProcessPoolExecutor
+    """
+    # Nessuna finestra di errore di Windows su file danneggiati o non accessibili:
+    # l'errore viene restituito subito alla chiamata API invece di bloccare il worker
+    try:
+        ctypes.windll.kernel32.SetErrorMode(SEM_FAILCRITICALERRORS | SEM_NOGPFAULTERRORBOX | SEM_NOOPENFILEERRORBOX)
+    except:
+        pass
+
+    _load_version_api()
+
+# Stringhe di query per VerQueryValueW già convertite in UTF-16 e riutilizzate per tutti i file
+_QUERY_ROOT = ctypes.c_wchar_p("\\")
+_QUERY_TRANSLATION = ctypes.c_wchar_p("\\VarFileInfo\\Translation")
+_QUERY_CACHE: Dict[Tuple[str, str], ctypes.c_wchar_p] = {}
+
+# Buffer per GetFileVersionInfoW riutilizzato tra un file e l'altro: cresce fino
+# alla dimensione massima incontrata invece di essere allocato per ogni file
+_TLS = threading.local()
+_VERSION_BUFFER_MIN_SIZE = 65536
+
+# Traduzioni provate quando il file non dichiara le proprie,
+# ordinate dalla più frequente per trovare il valore con meno query
+DEFAULT_TRANSLATIONS = [
+    '040904B0',  # English (US) - Unicode
+    '000004B0',  # Neutral - Unicode
+    '040904E4',  # English (US) - Windows-1252
+    '041004B0',  # Italian - Unicode
+    '041004E4',  # Italian - Windows-1252
+    '040704B0',  # German - Unicode
+    '040C04B0',  # French - Unicode
+    '080904B0',  # English (UK) - Unicode
+    '000004E4'   # Neutral - Windows-1252
+]
+
+# Estensioni dei file da analizzare (confrontate con gli ultimi 4 caratteri del nome)
+_EXE_DLL_SUFFIXES = frozenset(('.exe', '.dll'))
 
 # Variabile globale per tracciare la modalità interattiva
 INTERACTIVE_MODE = False
@@ -117,6 +193,12 @@ def get_script_path():
         # Script Python normale
         return os.path.dirname(os.path.abspath(__file__))
 
+def format_local_time(t: time.struct_time) -> str:
+    """
+    Formatta l'ora locale come 'YYYY-MM-DD HH:MM:SS' senza passare da datetime/strftime
+    """
+    return f"{t.tm_year:04d}-{t.tm_mon:02d}-{t.tm_mday:02d} {t.tm_hour:02d}:{t.tm_min:02d}:{t.tm_sec:02d}"
+
 def create_semaphore_file(script_path):
     """
     Crea il file di semaforo equivalente al PowerShell
@@ -124,15 +206,14 @@ def create_semaphore_file(script_path):
     semaphore_path = os.path.join(script_path, "999_VOGG.TXT")
     semaphore_info = [
         str(os.getpid()),
-        datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        format_local_time(time.localtime()),
         os.environ.get('COMPUTERNAME', os.environ.get('HOSTNAME', 'Unknown')),
         os.environ.get('USERNAME', os.environ.get('USER', 'Unknown'))
     ]
 
     try:
         with open(semaphore_path, 'w', encoding='utf-8') as f:
-            for info in semaphore_info:
-                f.write(info + '\n')
+            f.write('\n'.join(semaphore_info) + '\n')
         return semaphore_path
     except Exception as e:
         print(f"Errore nella creazione del file di semaforo: {e}")
@@ -158,31 +239,23 @@ def get_all_available_translations(buffer):
         ptr = c_void_p()
         length = c_uint()
 
-        if VerQueryValueW(buffer, "\\VarFileInfo\\Translation", byref(ptr), byref(length)):
+        if VerQueryValueW(buffer, _QUERY_TRANSLATION, byref(ptr), byref(length)):
             if length.value >= 4:
-                for i in range(0, length.value, 4):
-                    try:
-                        lang = struct.unpack('<H', ctypes.string_at(ptr.value + i, 2))[0]
-                        cp = struct.unpack('<H', ctypes.string_at(ptr.value + i + 2, 2))[0]
-                        translations.append(f"{lang:04X}{cp:04X}")
-                    except:
-                        continue
+                # Una sola copia della tabella, scomposta in coppie (lingua, codepage)
+                raw = ctypes.string_at(ptr.value, length.value - length.value % 4)
+                seen = set()
+                for lang, cp in struct.iter_unpack('<HH', raw):
+                    translation = f"{lang:04X}{cp:04X}"
+                    # Alcuni file ripetono la stessa traduzione: evita query duplicate
+                    if translation not in seen:
+                        seen.add(translation)
+                        translations.append(translation)
     except:
         pass
 
     # Se non trovate traduzioni, usa quelle comuni + altre varianti
     if not translations:
-        translations = [
-            '040904B0',  # English (US) - Unicode
-            '040904E4',  # English (US) - Windows-1252
-            '041004B0',  # Italian - Unicode  
-            '041004E4',  # Italian - Windows-1252
-            '040704B0',  # German - Unicode
-            '040C04B0',  # French - Unicode
-            '080904B0',  # English (UK) - Unicode
-            '000004B0',  # Neutral - Unicode
-            '000004E4'   # Neutral - Windows-1252
-        ]
+        translations = DEFAULT_TRANSLATIONS
 
     return translations
 
@@ -190,33 +263,218 @@ def get_string_from_version_info(buffer, key, translations):
     """
     Cerca una stringa nelle informazioni di versione usando tutte le traduzioni disponibili
     """
+    # Parametri di uscita e riferimenti creati una volta sola e riutilizzati a ogni
+    # traduzione: nel ciclo resta solo la chiamata a VerQueryValueW
+    s_ptr = c_void_p()
+    s_len = c_uint()
+    s_ptr_ref = byref(s_ptr)
+    s_len_ref = byref(s_len)
+    query_cache = _QUERY_CACHE
+
     for translation in translations:
         try:
-            query_str = f"\\StringFileInfo\\{translation}\\{key}"
-            s_ptr = c_void_p()
-            s_len = c_uint()
-
-            if VerQueryValueW(buffer, query_str, byref(s_ptr), byref(s_len)):
-                if s_len.value > 0:
-                    try:
-                        value = ctypes.wstring_at(s_ptr.value)
-                        if value and value.strip():
-                            return value.strip()
-                    except:
-                        continue
+            query_str = query_cache.get((translation, key))
+            if query_str is None:
+                query_str = ctypes.c_wchar_p(f"\\StringFileInfo\\{translation}\\{key}")
+                query_cache[(translation, key)] = query_str
+
+            if VerQueryValueW(buffer, query_str, s_ptr_ref, s_len_ref) and s_len.value > 0:
+                value = ctypes.wstring_at(s_ptr.value).strip()
+                if value:
+                    return value
         except:
             continue
 
     return ""
 
-def get_version_info_local(file_path: str, key: str) -> Optional[Dict[str, str]]:
+def _resource_directory_entries(image, directory_offset: int) -> List[Tuple[int, int]]:
     """
-    REPLICA ESATTA della funzione Get-VersionInfoLocal del PowerShell
-    Cerca specificatamente la chiave richiesta nelle informazioni di versione
+    Legge le voci (Name, OffsetToData) di una IMAGE_RESOURCE_DIRECTORY
+    """
+    named_count, id_count = struct.unpack_from('<HH', image, directory_offset + 12)
+    first_entry = directory_offset + 16
+    return [struct.unpack_from('<II', image, first_entry + i * 8) for i in range(named_count + id_count)]
+
+def _resource_name(image, name_offset: int) -> str:
+    """
+    Legge il nome di una voce della directory delle risorse (IMAGE_RESOURCE_DIR_STRING_U)
+    """
+    length = struct.unpack_from('<H', image, name_offset)[0]
+    return bytes(image[name_offset + 2:name_offset + 2 + length * 2]).decode('utf-16-le')
+
+def _find_version_resource(image) -> Optional[bytes]:
+    """
+    Percorre intestazioni PE e directory delle risorse fino alla risorsa RT_VERSION
+    Restituisce i byte di VS_VERSIONINFO (wLength byte), b"" se il PE non ha informazioni
+    di versione, None se la struttura non è quella attesa o se il risultato di
+    GetFileVersionInfoW potrebbe essere diverso (satellite .mui, più lingue)
+    """
+    if len(image) < 0x40 or image[:2] != b'MZ':
+        return None
+
+    e_lfanew = struct.unpack_from('<I', image, 0x3C)[0]
+    if image[e_lfanew:e_lfanew + 4] != b'PE\0\0':
+        return None
+
+    # IMAGE_FILE_HEADER: NumberOfSections a +2, SizeOfOptionalHeader a +16
+    number_of_sections = struct.unpack_from('<H', image, e_lfanew + 4 + 2)[0]
+    size_of_optional_header = struct.unpack_from('<H', image, e_lfanew + 4 + 16)[0]
+    optional_header = e_lfanew + 24
+
+    magic = struct.unpack_from('<H', image, optional_header)[0]
+    if magic == 0x10B:  # PE32
+        rva_count_offset, data_dirs_offset = 92, 96
+    elif magic == 0x20B:  # PE32+
+        rva_count_offset, data_dirs_offset = 108, 112
+    else:
+        return None
+
+    # La directory delle risorse è la terza voce (IMAGE_DIRECTORY_ENTRY_RESOURCE)
+    if struct.unpack_from('<I', image, optional_header + rva_count_offset)[0] <= 2:
+        return b""
+
+    resource_rva, resource_size = struct.unpack_from('<II', image, optional_header + data_dirs_offset + 2 * 8)
+    if not resource_rva or not resource_size:
+        return b""
+
+    # Tabella delle sezioni (VirtualSize, VirtualAddress, SizeOfRawData, PointerToRawData)
+    # per convertire gli RVA in offset nel file
+    section_table = optional_header + size_of_optional_header
+    sections = [struct.unpack_from('<IIII', image, section_table + i * 40 + 8) for i in range(number_of_sections)]
+
+    def rva_to_offset(rva):
+        for virtual_size, virtual_address, raw_size, raw_pointer in sections:
+            if virtual_address <= rva < virtual_address + max(virtual_size, raw_size):
+                return rva - virtual_address + raw_pointer
+        return None
+
+    resource_base = rva_to_offset(resource_rva)
+    if resource_base is None:
+        return None
+
+    # Livelli della directory: tipo (RT_VERSION) -> nome (VS_VERSION_INFO) -> lingua
+    offset = None
+    for name, entry_offset in _resource_directory_entries(image, resource_base):
+        # Con un satellite .mui GetFileVersionInfoW unisce le stringhe localizzate
+        # alla risorsa del file: in quel caso si usano le API
+        if name & 0x80000000 and _resource_name(image, resource_base + (name & 0x7FFFFFFF)).upper() == 'MUI':
+            return None
+        if name == RT_VERSION:
+            offset = entry_offset
+    if offset is None:
+        return b""
+
+    if not offset & 0x80000000:
+        return None
+    for name, entry_offset in _resource_directory_entries(image, resource_base + (offset & 0x7FFFFFFF)):
+        if name == VS_VERSION_INFO:
+            offset = entry_offset
+            break
+    else:
+        return None
+
+    if not offset & 0x80000000:
+        return None
+    # Con più lingue la scelta spetta al loader di Windows, che considera la lingua
+    # dell'interfaccia utente: in quel caso si usano le API
+    languages = _resource_directory_entries(image, resource_base + (offset & 0x7FFFFFFF))
+    if len(languages) != 1 or languages[0][1] & 0x80000000:
+        return None
+
+    # IMAGE_RESOURCE_DATA_ENTRY: RVA e dimensione dei dati
+    data_rva, data_size = struct.unpack_from('<II', image, resource_base + languages[0][1])
+    data_offset = rva_to_offset(data_rva)
+    if data_offset is None or data_size < 6 or data_offset + data_size > len(image):
+        return None
+
+    # wLength di VS_VERSIONINFO non può superare la risorsa che lo contiene; eventuale
+    # padding oltre wLength non fa parte delle informazioni di versione
+    w_length = struct.unpack_from('<H', image, data_offset)[0]
+    if w_length < 6 or w_length > data_size:
+        return None
+
+    return image[data_offset:data_offset + w_length]
+
+def _open_for_mapping(file_path: str) -> int:
+    """
+    Apre il file in sola lettura e restituisce un descrittore da passare a mmap
+    Su Windows il file è aperto con CreateFileW e FILE_FLAG_SEQUENTIAL_SCAN, un
+    suggerimento per la cache di sistema e per l'antivirus, e condiviso anche in
+    cancellazione per non bloccare altri processi
+    """
+    if CreateFileW is None:
+        return os.open(file_path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+
+    import msvcrt
+
+    handle = CreateFileW(file_path, GENERIC_READ, FILE_SHARE_READ | FILE_SHARE_WRITE | FILE_SHARE_DELETE,
+                         None, OPEN_EXISTING, FILE_ATTRIBUTE_NORMAL | FILE_FLAG_SEQUENTIAL_SCAN, None)
+    if not handle or handle == INVALID_HANDLE_VALUE:
+        raise OSError(f"CreateFileW non riuscita: {file_path}")
+
+    try:
+        # Il descrittore diventa proprietario dell'handle: os.close() lo chiude
+        return msvcrt.open_osfhandle(handle, os.O_RDONLY)
+    except Exception:
+        CloseHandle(handle)
+        raise
+
+def _read_version_resource(file_path: str) -> Optional[bytes]:
+    """
+    Legge la risorsa RT_VERSION dal file PE mappato in memoria, senza far caricare
+    il file come immagine da GetFileVersionInfoSizeW/GetFileVersionInfoW:
+    vengono letti solo le intestazioni e i pochi KB della risorsa
+    Restituisce None se il file non può essere analizzato (si usano le API)
+    """
+    try:
+        fd = _open_for_mapping(file_path)
+    except Exception:
+        return None
+
+    try:
+        # Lo stesso handle fornisce dimensione e contenuto del file
+        with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as image:
+            return _find_version_resource(image)
+    except Exception:
+        return None
+    finally:
+        os.close(fd)
+
+def _get_version_buffer(size: int):
+    """
+    Restituisce il buffer riutilizzabile del thread corrente, grande almeno size byte
+    """
+    buffer = getattr(_TLS, 'version_buffer', None)
+    if buffer is None or len(buffer) < size:
+        buffer = create_string_buffer(max(size, _VERSION_BUFFER_MIN_SIZE))
+        _TLS.version_buffer = buffer
+    return buffer
+
+def load_version_info(file_path: str):
+    """
+    Legge una sola volta il blocco delle informazioni di versione del file
+    Restituisce il buffer da usare per tutte le ricerche, oppure None se il file non ne ha
+    Il buffer è riutilizzato dal file successivo elaborato dallo stesso thread
     """
     if not WINDOWS_API_AVAILABLE:
         return None
 
+    # Prima la lettura diretta della risorsa dal file PE
+    resource = _read_version_resource(file_path)
+    if resource == b"":
+        return None
+
+    if resource is not None:
+        # Stessa disposizione prodotta da GetFileVersionInfoW: VS_VERSIONINFO (wLength
+        # byte), firma "FE2X" subito dopo e spazio libero che VerQueryValue può usare
+        # per le conversioni
+        size = len(resource) * 2 + 4
+        buffer = _get_version_buffer(size)
+        ctypes.memmove(buffer, resource, len(resource))
+        ctypes.memmove(ctypes.addressof(buffer) + len(resource), b'FE2X', 4)
+        return buffer
+
+    # File non analizzabile (es. eseguibili 16 bit): si usano le API di Windows
     try:
         handle = wintypes.DWORD(0)
         size = GetFileVersionInfoSizeW(file_path, byref(handle))
@@ -224,14 +482,25 @@ def get_version_info_local(file_path: str, key: str) -> Optional[Dict[str, str]]
         if size <= 0:
             return None
 
-        buffer = create_string_buffer(size)
+        buffer = _get_version_buffer(size)
 
         if not GetFileVersionInfoW(file_path, 0, size, buffer):
             return None
 
-        # Ottieni tutte le traduzioni disponibili
-        translations = get_all_available_translations(buffer)
+        return buffer
+
+    except Exception:
+        return None
 
+def get_version_info_local(buffer, key: str, translations: List[str]) -> Optional[Dict[str, str]]:
+    """
+    REPLICA ESATTA della funzione Get-VersionInfoLocal del PowerShell
+    Cerca specificatamente la chiave richiesta nelle informazioni di versione già caricate
+    """
+    if buffer is None:
+        return None
+
+    try:
         # Cerca il valore per la chiave specifica
         value = get_string_from_version_info(buffer, key, translations)
 
@@ -246,117 +515,59 @@ def get_version_info_local(file_path: str, key: str) -> Optional[Dict[str, str]]
     except Exception:
         return None
 
-def get_file_version_info(file_path: str) -> Tuple[str, str]:
+def get_file_version_info(file_path: str, buffer, translations: List[str]) -> Tuple[str, str]:
     """
     Ottiene ProductName e FileVersion usando VersionInfo
     REPLICA ESATTA di: (Get-Item $FullName).VersionInfo.ProductName, (Get-Item $FullName).VersionInfo.FileVersion
     CON FOCUS SPECIALE SU ProductName che non veniva estratto correttamente
+    Usa il buffer già caricato da load_version_info, senza rileggere il file
     """
+    # Senza API native o senza informazioni di versione non c'è nulla da leggere:
+    # nome del file senza estensione e versione "0.0.0.0"
+    if not WINDOWS_API_AVAILABLE or buffer is None:
+        return os.path.splitext(os.path.basename(file_path))[0], "0.0.0.0"
+
     product_name = ""
     file_version = ""
 
     try:
-        # Prova prima con le API native (più controllo)
-        if WINDOWS_API_AVAILABLE:
-            handle = wintypes.DWORD(0)
-            size = GetFileVersionInfoSizeW(file_path, byref(handle))
+        # FileVersion dalla struttura VS_FIXEDFILEINFO
+        try:
+            ptr = c_void_p()
+            length = c_uint()
 
-            if size > 0:
-                buffer = create_string_buffer(size)
+            if VerQueryValueW(buffer, _QUERY_ROOT, byref(ptr), byref(length)):
+                if length.value >= VS_FIXEDFILEINFO_SIZE:
+                    # dwSignature, dwStrucVersion, dwFileVersionMS, dwFileVersionLS, dwProductVersionMS/LS
+                    file_version_ms, file_version_ls = struct.unpack_from('<6I', ctypes.string_at(ptr.value, 24))[2:4]
 
-                if GetFileVersionInfoW(file_path, 0, size, buffer):
-                    # Ottieni tutte le traduzioni disponibili
-                    translations = get_all_available_translations(buffer)
+                    major = (file_version_ms >> 16) & 0xFFFF
+                    minor = file_version_ms & 0xFFFF
+                    build = (file_version_ls >> 16) & 0xFFFF
+                    revision = file_version_ls & 0xFFFF
 
-                    # FileVersion dalla struttura VS_FIXEDFILEINFO
-                    try:
-                        ptr = c_void_p()
-                        length = c_uint()
-
-                        if VerQueryValueW(buffer, "\\", byref(ptr), byref(length)):
-                            if length.value >= ctypes.sizeof(VS_FIXEDFILEINFO):
-                                fixed_info = ctypes.cast(ptr, POINTER(VS_FIXEDFILEINFO)).contents
-
-                                major = (fixed_info.dwFileVersionMS >> 16) & 0xFFFF
-                                minor = fixed_info.dwFileVersionMS & 0xFFFF
-                                build = (fixed_info.dwFileVersionLS >> 16) & 0xFFFF
-                                revision = fixed_info.dwFileVersionLS & 0xFFFF
-
-                                file_version = f"{major}.{minor}.{build}.{revision}"
-                    except:
-                        pass
-
-                    # ProductName con ricerca estensiva in tutte le traduzioni
-                    product_name = get_string_from_version_info(buffer, "ProductName", translations)
-
-                    # Se ProductName è vuoto, prova altre chiavi correlate
-                    if not product_name:
-                        # Prova FileDescription come alternativa
-                        product_name = get_string_from_version_info(buffer, "FileDescription", translations)
-
-                    # Se ancora vuoto, prova InternalName
-                    if not product_name:
-                        product_name = get_string_from_version_info(buffer, "InternalName", translations)
-
-                    # Se ancora vuoto, prova OriginalFilename senza estensione
-                    if not product_name:
-                        original_name = get_string_from_version_info(buffer, "OriginalFilename", translations)
-                        if original_name:
-                            # Rimuovi estensione
-                            product_name = os.path.splitext(original_name)[0]
-
-        # Fallback con pywin32 se le API native non hanno funzionato
-        if (not product_name or not file_version):
-            try:
-                import win32api
-
-                # FileVersion se non ancora ottenuto
-                if not file_version:
-                    try:
-                        version_info = win32api.GetFileVersionInfo(file_path, "\\")
-                        ms = version_info['FileVersionMS']
-                        ls = version_info['FileVersionLS']
-                        file_version = f"{win32api.HIWORD(ms)}.{win32api.LOWORD(ms)}.{win32api.HIWORD(ls)}.{win32api.LOWORD(ls)}"
-                    except:
-                        pass
-
-                # ProductName se non ancora ottenuto - prova varie codepage
-                if not product_name:
-                    codepages = ['040904B0', '040904E4', '041004B0', '041004E4', '000004B0', '040704B0', '040C04B0']
-
-                    for cp in codepages:
-                        try:
-                            product_name = win32api.GetFileVersionInfo(file_path, f"\\StringFileInfo\\{cp}\\ProductName")
-                            if product_name and product_name.strip():
-                                product_name = product_name.strip()
-                                break
-                        except:
-                            continue
-
-                    # Se ProductName ancora vuoto, prova FileDescription
-                    if not product_name:
-                        for cp in codepages:
-                            try:
-                                product_name = win32api.GetFileVersionInfo(file_path, f"\\StringFileInfo\\{cp}\\FileDescription")
-                                if product_name and product_name.strip():
-                                    product_name = product_name.strip()
-                                    break
-                            except:
-                                continue
-
-                    # Se ancora vuoto, prova InternalName
-                    if not product_name:
-                        for cp in codepages:
-                            try:
-                                product_name = win32api.GetFileVersionInfo(file_path, f"\\StringFileInfo\\{cp}\\InternalName")
-                                if product_name and product_name.strip():
-                                    product_name = product_name.strip()
-                                    break
-                            except:
-                                continue
-
-            except ImportError:
-                pass
+                    file_version = f"{major}.{minor}.{build}.{revision}"
+        except:
+            pass
+
+        # ProductName con ricerca estensiva in tutte le traduzioni
+        product_name = get_string_from_version_info(buffer, "ProductName", translations)
+
+        # Se ProductName è vuoto, prova altre chiavi correlate
+        if not product_name:
+            # Prova FileDescription come alternativa
+            product_name = get_string_from_version_info(buffer, "FileDescription", translations)
+
+        # Se ancora vuoto, prova InternalName
+        if not product_name:
+            product_name = get_string_from_version_info(buffer, "InternalName", translations)
+
+        # Se ancora vuoto, prova OriginalFilename senza estensione
+        if not product_name:
+            original_name = get_string_from_version_info(buffer, "OriginalFilename", translations)
+            if original_name:
+                # Rimuovi estensione
+                product_name = os.path.splitext(original_name)[0]
 
     except Exception:
         pass
@@ -371,21 +582,26 @@ def get_file_version_info(file_path: str) -> Tuple[str, str]:
 
     return product_name, file_version
 
-def process_file(file_info: Tuple[str, str]) -> Optional[Dict[str, any]]:
+def process_file(file_info: Tuple[str, int, float, str]) -> Optional[Tuple[str, str, str, int]]:
     """
     Processa un singolo file per estrarre le informazioni di versione
     REPLICA ESATTA della logica PowerShell con ProductName corretto
+    Restituisce i valori delle colonne PercorsoCompleto, Package, DataOra, Dimensione
     """
-    full_path, key = file_info
+    full_path, size, mtime_ts, key = file_info
 
     try:
-        # Ottieni informazioni del file
-        file_stat = os.stat(full_path)
-        last_modified = datetime.datetime.fromtimestamp(file_stat.st_mtime)
+        # Dimensione e data di modifica arrivano dalla scansione delle cartelle
+        last_modified = format_local_time(time.localtime(mtime_ts))
+
+        # Le informazioni di versione e le traduzioni vengono lette una sola volta
+        # e condivise dalla ricerca della chiave e dal fallback ProductName/FileVersion
+        buffer = load_version_info(full_path)
+        translations = get_all_available_translations(buffer) if buffer is not None else []
 
         # STEP 1: Prova a ottenere il valore per la chiave specifica
         # Equivalente a: $valueInfo = Try-GetVersionObject $FullName $Key
-        value_info = get_version_info_local(full_path, key)
+        value_info = get_version_info_local(buffer, key, translations)
 
         # STEP 2: Applica la logica condizionale esatta del PowerShell
         if value_info and value_info.get('Value'):
@@ -394,44 +610,118 @@ def process_file(file_info: Tuple[str, str]) -> Optional[Dict[str, any]]:
         else:
             # FALLBACK: Usa ProductName - FileVersion (ORA CORRETTO!)
             # Equivalente a: "{0} - {1}" -f (Get-Item $FullName).VersionInfo.ProductName, (Get-Item $FullName).VersionInfo.FileVersion
-            product_name, file_version = get_file_version_info(full_path)
+            product_name, file_version = get_file_version_info(full_path, buffer, translations)
             package_value = f"{product_name} - {file_version}"
 
-        return {
-            'PercorsoCompleto': full_path,
-            'Package': package_value,
-            'DataOra': last_modified.strftime('%Y-%m-%d %H:%M:%S'),
-            'Dimensione': file_stat.st_size
-        }
+        return full_path, package_value, last_modified, size
 
     except Exception as e:
         return None
 
-def scan_files(root_paths: List[str]) -> List[str]:
+def _resolve_root_paths(root_paths: List[str]) -> List[str]:
+    """
+    Risolve i percorsi radice eliminando duplicati e cartelle contenute in un'altra radice,
+    così che nessun file venga visitato due volte durante la scansione
+    """
+    resolved = {}
+    for root_path in root_paths:
+        resolved_path = os.path.abspath(root_path)
+        if os.path.exists(resolved_path):
+            resolved.setdefault(os.path.normcase(resolved_path), resolved_path)
+
+    roots = []
+    for norm_path in sorted(resolved):
+        if any(norm_path.startswith(os.path.join(parent, '')) for parent, _ in roots):
+            continue
+        roots.append((norm_path, resolved[norm_path]))
+
+    return [resolved_path for _, resolved_path in roots]
+
+def _walk(path: str):
+    """
+    Visita la cartella e le sottocartelle con os.scandir restituendo i file .exe e .dll
+    come tuple (percorso, dimensione, data di modifica) lette dal DirEntry
+    Usa una pila esplicita invece della ricorsione: alberi molto profondi non
+    raggiungono il limite di ricorsione di Python
+    """
+    pending_dirs = [path]
+
+    while pending_dirs:
+        current_dir = pending_dirs.pop()
+        subdirs = []
+
+        try:
+            with os.scandir(current_dir) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.path)
+                        elif entry.name[-4:].lower() in _EXE_DLL_SUFFIXES and entry.is_file():
+                            # Su Windows stat() del DirEntry usa i dati già letti dalla
+                            # enumerazione della cartella, senza ulteriori chiamate di sistema
+                            file_stat = entry.stat()
+                            yield entry.path, file_stat.st_size, file_stat.st_mtime
+                    except OSError:
+                        continue
+        except OSError:
+            continue  # Cartella non accessibile: come os.walk, la si ignora
+
+        # In ordine inverso, così le sottocartelle vengono visitate nell'ordine di enumerazione
+        pending_dirs.extend(reversed(subdirs))
+
+def scan_files(root_paths: List[str]) -> Iterator[Tuple[str, int, float]]:
     """
     Scansiona le cartelle per trovare file .exe e .dll
     Equivalente al blocco "Scansione file" di PowerShell
+    I file vengono restituiti man mano che sono trovati, così l'elaborazione
+    può iniziare mentre la scansione è ancora in corso
     """
-    all_files = []
-    seen_paths = set()
+    for resolved_path in _resolve_root_paths(root_paths):
+        yield from _walk(resolved_path)
 
-    for root_path in root_paths:
-        try:
-            # Risolvi il percorso
-            resolved_path = os.path.abspath(root_path)
-
-            if os.path.exists(resolved_path):
-                for root, dirs, files in os.walk(resolved_path):
-                    for file in files:
-                        if file.lower().endswith(('.exe', '.dll')):
-                            full_path = os.path.join(root, file)
-                            if full_path not in seen_paths:
-                                seen_paths.add(full_path)
-                                all_files.append(full_path)
-        except Exception as e:
-            continue  # Ignora errori e continua con il prossimo percorso
-
-    return all_files
+def process_files(file_infos: List[Tuple[str, int, float, str]]) -> Tuple[int, Tuple[List, List, List, List]]:
+    """
+    Processa un blocco di file in un processo worker
+    Restituisce il numero di file del blocco e i risultati validi per colonne:
+    percorsi, package, date e dimensioni in quattro liste parallele
+    """
+    paths, packages, datetimes, sizes = [], [], [], []
+
+    for file_info in file_infos:
+        result = process_file(file_info)
+        if result:
+            full_path, package_value, last_modified, size = result
+            paths.append(full_path)
+            packages.append(package_value)
+            datetimes.append(last_modified)
+            sizes.append(size)
+
+    return len(file_infos), (paths, packages, datetimes, sizes)
+
+def iter_batch_results(executor, files: Iterable[Tuple[str, int, float]], key: str,
+                       batch_size: int, max_in_flight: int) -> Iterator[Tuple[int, Tuple[List, List, List, List]]]:
+    """
+    Invia i file al pool a blocchi man mano che la scansione li trova e restituisce
+    i risultati dei blocchi completati
+    Al massimo max_in_flight blocchi sono in coda, per non accumulare la scansione in memoria
+    """
+    files = iter(files)
+    pending = set()
+
+    while True:
+        batch = [(file_path, size, mtime_ts, key) for file_path, size, mtime_ts in itertools.islice(files, batch_size)]
+        if not batch:
+            break
+
+        if len(pending) >= max_in_flight:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+        pending.add(executor.submit(process_files, batch))
+
+    for future in concurrent.futures.as_completed(pending):
+        yield future.result()
 
 def main():
     """
@@ -444,7 +734,7 @@ def main():
     parser.add_argument('--output-csv', help='Percorso del file CSV di output')
     parser.add_argument('--delimiter', default=';', help='Delimitatore CSV (default: ;)')
     parser.add_argument('--key', default='Package', help='Chiave per estrazione versione (default: Package)')
-    parser.add_argument('--max-threads', type=int, help='Numero massimo di thread')
+    parser.add_argument('--max-threads', type=int, help='Numero massimo di processi worker')
 
     args = parser.parse_args()
 
@@ -475,14 +765,6 @@ def main():
     semaphore_path = create_semaphore_file(script_path)
 
     try:
-        # Scansiona i file
-        all_files = scan_files(root_paths)
-
-        if not all_files:
-            if INTERACTIVE_MODE:
-                print("Nessun file .exe o .dll trovato.")
-            return
-
         # Calcola numero thread
         THREADS_MIN = 1
         THREADS_CAP = 32
@@ -492,33 +774,53 @@ def main():
         max_threads = args.max_threads if args.max_threads else computed_threads
         max_threads = min(THREADS_CAP, max(THREADS_MIN, max_threads))
 
-        if INTERACTIVE_MODE:
-            print(f"Elaborazione di {len(all_files)} file con {max_threads} thread...")
-
-        # Processa i file in parallelo
-        file_infos = [(file_path, args.key) for file_path in all_files]
-        results = []
-
-        with concurrent.futures.ThreadPoolExecutor(max_workers=max_threads) as executor:
-            future_to_file = {executor.submit(process_file, file_info): file_info for file_info in file_infos}
-
-            for future in concurrent.futures.as_completed(future_to_file):
-                result = future.result()
-                if result:
-                    results.append(result)
+        # Il lavoro è CPU-bound (ctypes + parsing delle stringhe): si usano processi
+        # e non thread, così il GIL non serializza l'elaborazione
+        max_workers = min(os.cpu_count() or 1, max_threads)
 
-        # Scrivi il CSV
-        if results:
-            with open(output_csv_path, 'w', newline='', encoding='utf-8') as csvfile:
-                fieldnames = ['PercorsoCompleto', 'Package', 'DataOra', 'Dimensione']
-                writer = csv.DictWriter(csvfile, fieldnames=fieldnames, delimiter=args.delimiter)
-
-                writer.writeheader()
-                for row in results:
-                    writer.writerow(row)
+        # File inviati a ogni processo worker per volta e blocchi in coda al massimo
+        BATCH_SIZE = 64
+        max_in_flight = max_workers * 4
 
+        if INTERACTIVE_MODE:
+            print(f"Scansione ed elaborazione dei file con {max_workers} processi...")
+
+        file_count = 0
+        row_count = 0
+
+        # La scansione delle cartelle procede nel processo principale mentre i worker
+        # elaborano i blocchi già trovati; i risultati vengono scritti nel CSV man mano
+        # che arrivano, senza tenerli tutti in memoria
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, initializer=_worker_init) as executor, \
+                contextlib.ExitStack() as stack:
+            writer = None
+
+            for batch_file_count, columns in iter_batch_results(executor, scan_files(root_paths), args.key,
+                                                                BATCH_SIZE, max_in_flight):
+                file_count += batch_file_count
+                paths, packages, datetimes, sizes = columns
+                if not paths:
+                    continue
+
+                # Scrivi il CSV (aperto solo quando c'è almeno una riga da esportare)
+                if writer is None:
+                    # Buffer di scrittura da 1 MB e righe ricomposte dalle colonne con zip:
+                    # csv.writer evita la ricerca per chiave di DictWriter su ogni campo
+                    csvfile = stack.enter_context(
+                        open(output_csv_path, 'w', newline='', encoding='utf-8', buffering=1 << 20)
+                    )
+                    writer = csv.writer(csvfile, delimiter=args.delimiter)
+                    writer.writerow(['PercorsoCompleto', 'Package', 'DataOra', 'Dimensione'])
+
+                writer.writerows(zip(paths, packages, datetimes, sizes))
+                row_count += len(paths)
+
+        if not file_count:
+            if INTERACTIVE_MODE:
+                print("Nessun file .exe o .dll trovato.")
+        elif row_count:
             if INTERACTIVE_MODE:
-                print(f"Creato: {output_csv_path} (righe: {len(results)})")
+                print(f"Creato: {output_csv_path} (righe: {row_count}, file analizzati: {file_count})")
         else:
             if INTERACTIVE_MODE:
                 print("Nessun dato esportato.")
@@ -532,4 +834,6 @@ def main():
             show_completion_message()
 
 if __name__ == "__main__":
+    # Necessario per gli eseguibili PyInstaller che avviano processi worker
+    multiprocessing.freeze_support()
     main()